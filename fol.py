@@ -1,4 +1,12 @@
 import re
+from collections import namedtuple
+from functools import lru_cache
+
+_SENTENCE_PATTERN = re.compile(r"(¬?\w+)\((.*)\)")
+_ARG_SEPARATOR = re.compile(r",\s*")
+
+# Parsed compound term; args are nested Terms or plain constant/variable strings
+Term = namedtuple('Term', 'pred args')
 
 def negate_query(query):
     if query.startswith("¬"):
@@ -12,26 +20,47 @@ def prepare_kb_with_negated_query(kb, query):
     kb_with_query.append([negated_query])
     return kb_with_query
 
+@lru_cache(maxsize=None)
 def parse_sentence(sentence):
-    match = re.match(r"(¬?\w+)\((.*)\)", sentence)
+    match = _SENTENCE_PATTERN.match(sentence)
     if not match:
-        return None, []
+        return None, ()
     predicate = match.group(1)
-    args = re.split(r",\s*", match.group(2))
+    args = tuple(_ARG_SEPARATOR.split(match.group(2)))
     return predicate, args
 
+@lru_cache(maxsize=None)
+def literal_sign_and_predicate(literal):
+    negated = literal.startswith("¬")
+    atom = literal[1:] if negated else literal
+    return negated, atom.split('(', 1)[0]
+
+@lru_cache(maxsize=None)
+def parse_term(term):
+    predicate, args = parse_sentence(term)
+    if predicate is None:
+        return term
+    return Term(predicate, tuple(parse_term(arg) for arg in args))
+
+def term_to_string(term):
+    if isinstance(term, Term):
+        return term.pred + '(' + ', '.join(term_to_string(arg) for arg in term.args) + ')'
+    return term
+
 def unify(sentence1, sentence2):
     substitutions = {}
-    predicate1, args1 = parse_sentence(sentence1)
-    predicate2, args2 = parse_sentence(sentence2)
-    if predicate1 != predicate2:
+    term1 = parse_term(sentence1)
+    term2 = parse_term(sentence2)
+    if not isinstance(term1, Term) or not isinstance(term2, Term):
         return {}  # Unification fails
-    if len(args1) != len(args2):
+    if term1.pred != term2.pred:
         return {}  # Unification fails
-    for arg1, arg2 in zip(args1, args2):
+    if len(term1.args) != len(term2.args):
+        return {}  # Unification fails
+    for arg1, arg2 in zip(term1.args, term2.args):
         if not unify_terms(arg1, arg2, substitutions):
             return {}  # Unification fails
-    return substitutions  # Unification succeeds
+    return {var: term_to_string(value) for var, value in substitutions.items()}  # Unification succeeds
 
 def unify_terms(term1, term2, substitutions):
     term1 = apply_substitution_to_term(term1, substitutions)
@@ -49,10 +78,9 @@ def unify_terms(term1, term2, substitutions):
         return True
 
     # Handle nested function terms
-    predicate1, args1 = parse_sentence(term1)
-    predicate2, args2 = parse_sentence(term2)
-    if predicate1 and predicate2 and predicate1 == predicate2 and len(args1) == len(args2):
-        for subterm1, subterm2 in zip(args1, args2):
+    if isinstance(term1, Term) and isinstance(term2, Term) and \
+       term1.pred == term2.pred and len(term1.args) == len(term2.args):
+        for subterm1, subterm2 in zip(term1.args, term2.args):
             if not unify_terms(subterm1, subterm2, substitutions):
                 return False
         return True
@@ -60,7 +88,7 @@ def unify_terms(term1, term2, substitutions):
     return False  # Unification fails if terms do not match
 
 def is_variable(term):
-    return len(term) > 0 and term[0].islower() and term.isalpha()
+    return isinstance(term, str) and len(term) > 0 and term[0].islower() and term.isalpha()
 
 def apply_substitution_to_literal(literal, substitution):
     predicate, args = parse_sentence(literal)
@@ -70,37 +98,75 @@ def apply_substitution_to_literal(literal, substitution):
 def apply_substitution_to_term(term, substitution):
     return substitution.get(term, term) if is_variable(term) else term
 
+def is_tautology(clause):
+    return any(negate_query(literal) in clause for literal in clause)
+
 def resolve(clause1, clause2):
     resolved_clauses = set()
+    # Sign and predicate are fixed per literal, so bucket clause2 by them once
+    literals2 = {}
+    for literal2 in clause2:
+        literals2.setdefault(literal_sign_and_predicate(literal2), []).append(literal2)
     for literal1 in clause1:
-        for literal2 in clause2:
-            if literal1.startswith("¬") and not literal2.startswith("¬") and \
-               literal1[1:].split('(')[0] == literal2.split('(')[0]:
+        negated1, predicate1 = literal_sign_and_predicate(literal1)
+        for literal2 in literals2.get((not negated1, predicate1), ()):
+            if negated1:
                 substitution = unify(literal1[1:], literal2)
-            elif not literal1.startswith("¬") and literal2.startswith("¬") and \
-                 literal1.split('(')[0] == literal2[1:].split('(')[0]:
-                substitution = unify(literal1, literal2[1:])
             else:
-                continue
+                substitution = unify(literal1, literal2[1:])
             if substitution is not None:
-                new_clause = (clause1 | clause2) - {literal1, literal2}
+                new_clause = (clause1 - {literal1}) | (clause2 - {literal2})
                 substituted_clause = {apply_substitution_to_literal(lit, substitution) for lit in new_clause}
+                if is_tautology(substituted_clause):
+                    continue
                 resolved_clauses.add(frozenset(substituted_clause))
     return resolved_clauses
 
+def index_clause(index, clause):
+    for literal in clause:
+        index.setdefault(literal_sign_and_predicate(literal), set()).add(clause)
+
+def resolution_candidates(index, clause):
+    candidates = set()
+    for literal in clause:
+        negated, predicate = literal_sign_and_predicate(literal)
+        candidates.update(index.get((not negated, predicate), ()))
+    return candidates
+
+def is_subsumed(index, clause):
+    for literal in clause:
+        for existing in index.get(literal_sign_and_predicate(literal), ()):
+            if existing <= clause:
+                return True
+    return False
+
+def remove_subsumed(index, clauses, clause):
+    literal = next(iter(clause))
+    subsumed = [existing for existing in index.get(literal_sign_and_predicate(literal), ())
+                if clause <= existing]
+    for existing in subsumed:
+        clauses.discard(existing)
+        for existing_literal in existing:
+            index[literal_sign_and_predicate(existing_literal)].discard(existing)
+
 def inference_by_resolution(kb, query):
     kb = prepare_kb_with_negated_query(kb, query)
-    clauses = set(frozenset(clause) for clause in kb)
+    clauses = set(frozenset(clause) for clause in kb if not is_tautology(clause))
     new_clauses = set(frozenset(clause) for clause in [kb[-1]])
 
+    # Clauses bucketed by (is_negated, predicate) of each of their literals
+    index = {}
+    for clause in clauses:
+        index_clause(index, clause)
+
     iteration = 0
 
     while True:
         iteration += 1
-        next_new_clauses = set()
+        resolvents_found = set()
         processed_pairs = set()
         for ci in new_clauses:
-            for cj in clauses:
+            for cj in resolution_candidates(index, ci):
                 if ci == cj:
                     continue
                 pair = frozenset([ci, cj])
@@ -111,13 +177,22 @@ def inference_by_resolution(kb, query):
                 if frozenset() in resolvents:
                     print("\nEmpty clause derived. The query is inferred to be TRUE.")
                     return True
-                next_new_clauses.update(resolvents - clauses)
+                resolvents_found.update(resolvents - clauses)
+
+        # Shorter clauses first, so a resolvent can subsume the longer ones found alongside it
+        next_new_clauses = set()
+        for resolvent in sorted(resolvents_found, key=len):
+            if is_subsumed(index, resolvent):
+                continue
+            remove_subsumed(index, clauses, resolvent)
+            clauses.add(resolvent)
+            index_clause(index, resolvent)
+            next_new_clauses.add(resolvent)
 
         if not next_new_clauses:
             print("\nNo new clauses were added. The query cannot be inferred.")
             return False
 
-        clauses.update(next_new_clauses)
         new_clauses = next_new_clauses
 
 def main():
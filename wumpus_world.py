@@ -33,33 +33,92 @@ class World:
         self.World_Layout.append("B34")
         self.World_Layout.append("P44")
 
-        self.facts = set()
+        self._facts = set()
+        self._fact_bits = 0  # Bits of the atoms in _facts, kept in step by tell()
+        self._atom_bits = {}
+        self._compiled = {}
+
+    @property
+    def facts(self):
+        """
+        Read-only view of the known facts; use tell() to add to them
+        """
+        return frozenset(self._facts)
 
     def ask(self, sentence):
         """
         Determines if a given sentence is true in the world
         """
+        code = self._compiled.get(sentence)
+        if code is None:
+            code = self._compiled[sentence] = self.compile(sentence)
+
+        facts = self._fact_bits
+        stack = []
+        for op, arg in code:
+            if op == 'ANY':
+                stack.append(facts & arg != 0)
+            elif op == 'ALL':
+                stack.append(facts & arg == arg)
+            elif op == 'NOT':
+                stack[-1] = not stack[-1]
+            elif op == 'AND':
+                operands = stack[-arg:]
+                del stack[-arg:]
+                stack.append(all(operands))
+            elif op == 'OR':
+                operands = stack[-arg:]
+                del stack[-arg:]
+                stack.append(any(operands))
+            elif op == 'IMPLIES':
+                b = stack.pop()
+                stack[-1] = not stack[-1] or b
+            elif op == 'IFF':
+                b = stack.pop()
+                stack[-1] = stack[-1] == b
+        return stack[0]
+
+    def compile(self, sentence):
+        """
+        Compiles a sentence into postfix (op, arg) instructions over the atom bitmask
+        """
         if isinstance(sentence, str):
-            return sentence in self.facts
+            return [('ANY', self._atom_bit(sentence))]
 
         operator, *operands = sentence
 
-        if operator == 'NOT':
-            return not self.ask(operands[0])
-        elif operator == 'AND':
-            return all(self.ask(op) for op in operands)
-        elif operator == 'OR':
-            return any(self.ask(op) for op in operands)
-        elif operator == 'IMPLIES':
-            return not self.ask(operands[0]) or self.ask(operands[1])
-        elif operator == 'IFF':
-            return self.ask(operands[0]) == self.ask(operands[1])
+        if operator in ('AND', 'OR') and all(isinstance(op, str) for op in operands):
+            # Only atoms below, so the whole node is a single mask test
+            mask = 0
+            for op in operands:
+                mask |= self._atom_bit(op)
+            return [('ALL' if operator == 'AND' else 'ANY', mask)]
+
+        if operator not in ('NOT', 'AND', 'OR', 'IMPLIES', 'IFF'):
+            raise ValueError(f"Invalid sentence: {sentence}")
+
+        code = []
+        for op in operands:
+            code.extend(self.compile(op))
+        code.append((operator, len(operands)))
+        return code
+
+    def _atom_bit(self, atom):
+        """
+        Returns the bitmask of an atom, assigning it the next free bit on first use
+        """
+        bit = self._atom_bits.get(atom)
+        if bit is None:
+            bit = self._atom_bits[atom] = 1 << len(self._atom_bits)
+        return bit
 
     def tell(self, sentence):
         """
         Adds a sentence to the world's set of known facts
         """
-        self.facts.add(sentence)
+        self._facts.add(sentence)
+        if isinstance(sentence, str):
+            self._fact_bits |= self._atom_bit(sentence)
 
 class Player:
     """
@@ -68,100 +127,239 @@ class Player:
 
     def __init__(self, kb):
         self.kb = kb
+        self._literal_ids = {}
+        self._nnf_cache = {}
+        self._cnf_cache = {}
 
     def convert_to_cnf(self, statement):
         """
         Converts a propositional logic statement into CNF
         """
-        if isinstance(statement, str):
-            return statement
+        clauses = self._cnf_clauses(self._to_nnf(statement))
+        operands = [clause[0] if len(clause) == 1 else ('OR', *clause) for clause in clauses]
+        return operands[0] if len(operands) == 1 else ('AND', *operands)
 
-        operator, *operands = statement
+    def _walk_bottom_up(self, root, cache, children, combine):
+        """
+        Fills cache[root] using an explicit stack, combining each node once all its children are cached
+        """
+        stack = [root]
+        while stack:
+            node = stack[-1]
+            if node in cache:
+                stack.pop()
+                continue
+            pending = [child for child in children(node) if child not in cache]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                cache[node] = combine(node)
+        return cache[root]
 
-        if operator == 'IFF':
-            a = self.convert_to_cnf(operands[0])
-            b = self.convert_to_cnf(operands[1])
-            return self.convert_to_cnf(('AND', ('IMPLIES', a, b), ('IMPLIES', b, a)))
+    def _to_nnf(self, statement, negate=False):
+        """
+        Eliminates IFF/IMPLIES and pushes NOT inwards, negating the statement if requested
+        """
+        return self._walk_bottom_up((statement, negate), self._nnf_cache, self._nnf_children, self._nnf_combine)
 
+    def _nnf_children(self, key):
+        """
+        Returns the (statement, negate) pairs whose NNF the given pair is built from
+        """
+        statement, negate = key
+        if isinstance(statement, str):
+            return []
+        operator, *operands = statement
+        if operator == 'NOT':
+            return [(operands[0], not negate)]
         if operator == 'IMPLIES':
-            a = self.convert_to_cnf(operands[0])
-            b = self.convert_to_cnf(operands[1])
-            return self.convert_to_cnf(('OR', ('NOT', a), b))
+            a, b = operands
+            return [(a, False), (b, True)] if negate else [(a, True), (b, False)]
+        if operator == 'IFF':
+            a, b = operands
+            return [(a, False), (b, False), (a, True), (b, True)]
+        if operator in ('AND', 'OR'):
+            return [(op, negate) for op in operands]
+        return []
 
-        if operator == 'NOT':
-            operand = operands[0]
-            if isinstance(operand, str):
-                return ('NOT', operand)
-            elif operand[0] == 'NOT':
-                return self.convert_to_cnf(operand[1])
-            elif operand[0] == 'AND':
-                return self.convert_to_cnf(('OR', ('NOT', operand[1]), ('NOT', operand[2])))
-            elif operand[0] == 'OR':
-                return self.convert_to_cnf(('AND', ('NOT', operand[1]), ('NOT', operand[2])))
-            else:
-                return ('NOT', self.convert_to_cnf(operand))
+    def _nnf_combine(self, key):
+        """
+        Builds the NNF of a (statement, negate) pair from the cached NNF of its children
+        """
+        statement, negate = key
+        if isinstance(statement, str):
+            return ('NOT', statement) if negate else statement
 
-        if operator == 'OR':
-            left = self.convert_to_cnf(operands[0])
-            right = self.convert_to_cnf(operands[1])
+        def nnf(operand, negated=False):
+            return self._nnf_cache[(operand, negated)]
 
-            if isinstance(left, tuple) and left[0] == 'AND':
-                return self.convert_to_cnf(('AND', ('OR', left[1], right), ('OR', left[2], right)))
-            if isinstance(right, tuple) and right[0] == 'AND':
-                return self.convert_to_cnf(('AND', ('OR', left, right[1]), ('OR', left, right[2])))
-            return ('OR', left, right)
+        operator, *operands = statement
+        if operator == 'NOT':
+            return nnf(operands[0], not negate)
+        if operator == 'IMPLIES':
+            a, b = operands
+            if negate:
+                return ('AND', nnf(a), nnf(b, True))
+            return ('OR', nnf(a, True), nnf(b))
+        if operator == 'IFF':
+            a, b = operands
+            if negate:
+                return ('AND', ('OR', nnf(a), nnf(b)), ('OR', nnf(a, True), nnf(b, True)))
+            return ('AND', ('OR', nnf(a, True), nnf(b)), ('OR', nnf(b, True), nnf(a)))
+        if operator in ('AND', 'OR'):
+            if negate:
+                operator = 'OR' if operator == 'AND' else 'AND'
+            return (operator, *[nnf(op, negate) for op in operands])
+        return ('NOT', statement) if negate else statement
+
+    def _cnf_clauses(self, nnf):
+        """
+        Distributes OR over AND in an NNF statement and returns its clauses as tuples of literals
+        """
+        return self._walk_bottom_up(nnf, self._cnf_cache, self._cnf_children, self._cnf_combine)
 
-        if operator == 'AND':
-            return ('AND', *[self.convert_to_cnf(op) for op in operands])
+    def _cnf_children(self, nnf):
+        """
+        Returns the operands of an AND/OR node, or nothing for a literal
+        """
+        if isinstance(nnf, str) or nnf[0] not in ('AND', 'OR'):
+            return []
+        return list(nnf[1:])
 
-        return statement
+    def _cnf_combine(self, nnf):
+        """
+        Builds the clauses of an NNF node from the cached clauses of its operands
+        """
+        if isinstance(nnf, str) or nnf[0] not in ('AND', 'OR'):
+            return [(nnf,)]
+        if nnf[0] == 'AND':
+            return [clause for op in nnf[1:] for clause in self._cnf_cache[op]]
+        clauses = [()]
+        for op in nnf[1:]:
+            op_clauses = self._cnf_cache[op]
+            if len(op_clauses) == 1:
+                # Operand is already a single clause, so just append its literals
+                clauses = [clause + op_clauses[0] for clause in clauses]
+            else:
+                clauses = [clause + other for clause in clauses for other in op_clauses]
+        return clauses
 
     def _extract_clauses(self, cnf):
         """
         Extracts clauses from a CNF expression
         """
-        if isinstance(cnf, str) or (isinstance(cnf, tuple) and cnf[0] == 'NOT'):
-            return [[cnf]]
-        elif cnf[0] == 'AND':
-            clauses = []
-            for operand in cnf[1:]:
-                clauses.extend(self._extract_clauses(operand))
-            return clauses
-        elif cnf[0] == 'OR':
-            clause = []
-            operands = list(cnf[1:])
-            while operands:
-                operand = operands.pop(0)
-                if isinstance(operand, tuple) and operand[0] == 'OR':
-                    operands.extend(operand[1:])
-                else:
-                    clause.append(operand)
-            return [clause]
-        else:
-            return [[cnf]]
-
-    def _literal_to_string(self, literal):
-        """
-        Converts a literal to its string representation
-        """
-        if isinstance(literal, str):
-            return literal
-        elif isinstance(literal, tuple) and literal[0] == 'NOT':
-            return '~' + self._literal_to_string(literal[1])
-        else:
+        clauses = []
+        stack = [cnf]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, tuple) and node[0] == 'AND':
+                stack.extend(reversed(node[1:]))
+            elif isinstance(node, tuple) and node[0] == 'OR':
+                clause = []
+                operands = list(reversed(node[1:]))
+                while operands:
+                    operand = operands.pop()
+                    if isinstance(operand, tuple) and operand[0] == 'OR':
+                        operands.extend(reversed(operand[1:]))
+                    else:
+                        clause.append(operand)
+                clauses.append(clause)
+            else:
+                clauses.append([node])
+        return clauses
+
+    def _intern_literal(self, literal):
+        """
+        Maps a literal to a signed integer ID, where a negated atom gets the negative ID of the atom
+        """
+        if isinstance(literal, tuple) and literal[0] == 'NOT':
+            return -self._intern_literal(literal[1])
+        if not isinstance(literal, str):
             raise ValueError(f"Invalid literal: {literal}")
+        literal_id = self._literal_ids.get(literal)
+        if literal_id is None:
+            literal_id = self._literal_ids[literal] = len(self._literal_ids) + 1
+        return literal_id
 
     def resolve_clauses(self, ci, cj):
         """
         Resolves two clauses and returns the set of resolvents
         """
-        resolvents = set()
-        for di in ci:
-            for dj in cj:
-                if di == '~' + dj or dj == '~' + di:
-                    new_clause = (ci - {di}) | (cj - {dj})
-                    resolvents.add(frozenset(new_clause))
-        return resolvents
+        if len(ci) > len(cj):
+            ci, cj = cj, ci  # Probe with the smaller clause
+        complements = [di for di in ci if -di in cj]
+        if len(complements) != 1:
+            # With two or more complementary pairs every resolvent is a tautology
+            return set()
+        di = complements[0]
+        new_clause = (ci - {di}) | (cj - {-di})
+        if any(-literal in new_clause for literal in new_clause):
+            return set()  # Tautologies carry no information
+        return {new_clause}
+
+    def _unit_propagate(self, clauses):
+        """
+        Simplifies clauses by unit propagation, returning None if a contradiction is derived
+        """
+        clauses = [set(clause) for clause in clauses]
+        occurrences = {}  # Literal -> indices of the clauses containing it
+        for i, clause in enumerate(clauses):
+            if not clause:
+                return None
+            for literal in clause:
+                occurrences.setdefault(literal, set()).add(i)
+
+        alive = set(range(len(clauses)))
+        units = [i for i, clause in enumerate(clauses) if len(clause) == 1]
+        while units:
+            i = units.pop()
+            if i not in alive:
+                continue
+            (literal,) = clauses[i]
+            # Every clause containing the literal is satisfied
+            alive.difference_update(occurrences.pop(literal, ()))
+            # And its complement can be removed from the rest
+            for j in occurrences.pop(-literal, ()):
+                if j not in alive:
+                    continue
+                clauses[j].discard(-literal)
+                if not clauses[j]:
+                    return None
+                if len(clauses[j]) == 1:
+                    units.append(j)
+
+        return [frozenset(clauses[i]) for i in sorted(alive)]
+
+    def _index_clause(self, clause, occurrences):
+        """
+        Records the clause under each of its literals
+        """
+        for literal in clause:
+            occurrences.setdefault(literal, set()).add(clause)
+
+    def _is_subsumed(self, clause, occurrences):
+        """
+        Checks whether any existing clause is a subset of the given clause
+        """
+        # A subsuming clause shares every one of its literals with the clause
+        for literal in clause:
+            for existing in occurrences.get(literal, ()):
+                if existing <= clause:
+                    return True
+        return False
+
+    def _remove_subsumed(self, clause, clauses_index, occurrences):
+        """
+        Removes every existing clause that the given clause is a subset of
+        """
+        # A subsumed clause contains all of the clause's literals, so its rarest one is enough
+        rarest = min(clause, key=lambda literal: len(occurrences.get(literal, ())))
+        subsumed = [existing for existing in occurrences.get(rarest, ()) if clause <= existing]
+        for existing in subsumed:
+            clauses_index.discard(existing)
+            for literal in existing:
+                occurrences[literal].discard(existing)
 
     def inference_by_resolution(self, query):
         """
@@ -175,22 +373,40 @@ class Player:
         negated_query = self.convert_to_cnf(('NOT', query))
         clauses.extend(self._extract_clauses(negated_query))
 
-        clauses = [set(self._literal_to_string(literal) for literal in clause) for clause in clauses]
+        clauses = self._unit_propagate(
+            [frozenset(self._intern_literal(literal) for literal in clause) for clause in clauses])
+        if clauses is None:
+            return True
+        clauses = list(dict.fromkeys(clauses))
+        clauses_index = set(clauses)  # Clauses still in play, for O(1) membership
+        occurrences = {}  # Literal -> clauses in play containing it
+        for clause in clauses:
+            self._index_clause(clause, occurrences)
+        processed = 0  # clauses[:processed] have already been resolved against each other
         new = set()
 
         while True:
             n = len(clauses)
-            pairs = [(clauses[i], clauses[j]) for i in range(n) for j in range(i+1, n)]
+            pairs = ((clauses[i], clauses[j]) for j in range(processed, n) for i in range(j))
             for (ci, cj) in pairs:
+                if ci not in clauses_index or cj not in clauses_index:
+                    continue  # Subsumed since it was added
                 resolvents = self.resolve_clauses(ci, cj)
                 if frozenset() in resolvents:
                     return True
                 new.update(resolvents)
-            if new.issubset(set(frozenset(c) for c in clauses)):
+            processed = n
+            added = False
+            for clause in sorted(new, key=len):
+                if clause in clauses_index or self._is_subsumed(clause, occurrences):
+                    continue
+                self._remove_subsumed(clause, clauses_index, occurrences)
+                clauses_index.add(clause)
+                self._index_clause(clause, occurrences)
+                clauses.append(clause)
+                added = True
+            if not added:
                 return False
-            for clause in new:
-                if set(clause) not in clauses:
-                    clauses.append(set(clause))
             new.clear()
 
 